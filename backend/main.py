@@ -4,11 +4,16 @@ import hmac
 import json
 import math
 import os
+import queue
 import secrets
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
@@ -26,6 +31,10 @@ MAX_ITINERARY_ITEMS = 500
 MAX_IMAGE_BYTES = int(os.getenv("MAX_ITINERARY_IMAGE_BYTES", str(5 * 1024 * 1024)))
 AUTH_TOKEN_TTL_SECONDS = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", str(14 * 24 * 60 * 60)))
 AUTH_SECRET = os.getenv("AUTH_SECRET", "change-this-in-production")
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "5"))
+WRITE_BATCH_MAX_OPS = int(os.getenv("WRITE_BATCH_MAX_OPS", "64"))
+WRITE_TIMEOUT_SECONDS = float(os.getenv("WRITE_TIMEOUT_SECONDS", "30"))
 
 REVIEW_STATUSES = {"pending", "approved", "rejected"}
 PROOF_RADIUS_KM = 5.0
@@ -71,11 +80,201 @@ def now_iso() -> str:
 
 
 def db_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+WriteOp = Callable[[sqlite3.Connection], Any]
+
+
+class WriteQueue:
+    """Single writer thread that group-commits queued write operations.
+
+    Each operation is a callable taking the writer's connection. Operations
+    arriving within WRITE_BATCH_WINDOW_MS of the first one share a single
+    transaction; each runs inside its own savepoint so a failing operation
+    (e.g. a 404 HTTPException) is rolled back without affecting the others.
+    """
+
+    def __init__(
+        self,
+        window_ms: float = WRITE_BATCH_WINDOW_MS,
+        max_ops: int = WRITE_BATCH_MAX_OPS,
+        timeout_seconds: float = WRITE_TIMEOUT_SECONDS,
+    ) -> None:
+        self.window_seconds = max(window_ms, 0.0) / 1000
+        self.max_ops = max(max_ops, 1)
+        self.timeout_seconds = timeout_seconds
+        self._queue: "queue.Queue[Optional[Tuple[WriteOp, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "batches": 0,
+            "operations": 0,
+            "failedOperations": 0,
+            "failedCommits": 0,
+            "maxBatchSize": 0,
+            "lastBatchSize": 0,
+            "totalCommitMs": 0.0,
+            "maxCommitMs": 0.0,
+            "lastCommitMs": 0.0,
+        }
+
+    def start(self) -> None:
+        with self._lock:
+            self._start_locked()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+        with self._lock:
+            self._fail_pending(RuntimeError("Database writer stopped."))
+
+    def submit(self, op: WriteOp) -> Any:
+        """Queue op for the writer thread and block until its batch commits.
+
+        On timeout the op is cancelled if it has not started yet; an op that is
+        already running cannot be cancelled and may still commit.
+        """
+        future: Future = Future()
+        with self._lock:
+            self._start_locked()
+            self._queue.put((op, future))
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError as exc:
+            if future.cancel():
+                detail = "Database is busy, the write was not applied. Please retry."
+            else:
+                detail = "Database write timed out and may still be applied."
+            raise HTTPException(status_code=503, detail=detail) from exc
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._stats)
+        batches = snapshot["batches"]
+        snapshot["avgBatchSize"] = round(snapshot["operations"] / batches, 3) if batches else 0.0
+        snapshot["avgCommitMs"] = round(snapshot["totalCommitMs"] / batches, 3) if batches else 0.0
+        snapshot["totalCommitMs"] = round(snapshot["totalCommitMs"], 3)
+        snapshot["windowMs"] = self.window_seconds * 1000
+        snapshot["maxOps"] = self.max_ops
+        snapshot["queued"] = self._queue.qsize()
+        return snapshot
+
+    def _collect(self, first: Tuple[WriteOp, Future]) -> Tuple[List[Tuple[WriteOp, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_ops:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _start_locked(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="triptales-db-writer", daemon=True)
+        self._thread.start()
+
+    def _fail_pending(self, error: BaseException) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(error)
+
+    def _run(self) -> None:
+        error: BaseException = RuntimeError("Database writer stopped.")
+        try:
+            conn = db_conn()
+            conn.isolation_level = None
+            try:
+                stopping = False
+                while not stopping:
+                    first = self._queue.get()
+                    if first is None:
+                        break
+                    batch, stopping = self._collect(first)
+                    self._commit_batch(conn, batch)
+            finally:
+                conn.close()
+        except BaseException as exc:
+            error = exc
+            if not isinstance(exc, Exception):
+                raise
+        finally:
+            # Fail queued callers now rather than leaving them to time out;
+            # the next submit starts a fresh writer.
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                self._fail_pending(error)
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: List[Tuple[WriteOp, Future]]) -> None:
+        batch = [(op, future) for op, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        failed = 0
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op, future in batch:
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    result = op(conn)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, False, exc))
+                    failed += 1
+                else:
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, True, result))
+            conn.execute("COMMIT")
+        except BaseException as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self._stats["failedCommits"] += 1
+            for _, future in batch:
+                future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        commit_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["operations"] += len(outcomes)
+            stats["failedOperations"] += failed
+            stats["lastBatchSize"] = len(outcomes)
+            stats["maxBatchSize"] = max(stats["maxBatchSize"], len(outcomes))
+            stats["lastCommitMs"] = round(commit_ms, 3)
+            stats["maxCommitMs"] = round(max(stats["maxCommitMs"], commit_ms), 3)
+            stats["totalCommitMs"] += commit_ms
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+write_queue = WriteQueue()
+
+
 def hash_password(password: str) -> str:
     salt = secrets.token_hex(16)
     digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), 200000).hex()
@@ -337,6 +536,12 @@ app.add_middleware(
 @app.on_event("startup")
 def startup_event() -> None:
     init_db()
+    write_queue.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    write_queue.stop()
 
 
 def get_current_user(request: Request) -> Optional[Dict[str, Any]]:
@@ -492,7 +697,8 @@ def create_itinerary(payload: CreateItineraryRequest, request: Request) -> Dict[
     photo_path.write_bytes(parsed_photo["binary"])
     public_photo_path = "/" + str(photo_path.relative_to(ROOT_DIR)).replace("\\", "/")
     user = get_current_user(request)
-    with db_conn() as conn:
+
+    def insert_itinerary(conn: sqlite3.Connection) -> None:
         count_row = conn.execute("SELECT COUNT(*) AS cnt FROM itineraries").fetchone()
         if int(count_row["cnt"]) >= MAX_ITINERARY_ITEMS:
             conn.execute(
@@ -530,7 +736,8 @@ def create_itinerary(payload: CreateItineraryRequest, request: Request) -> Dict[
                 proof_verification["matchedRoutePoint"],
             ),
         )
-        conn.commit()
+
+    write_queue.submit(insert_itinerary)
     return get_itinerary(itinerary_id)
 
 
@@ -543,15 +750,16 @@ def update_itinerary_status(itinerary_id: str, payload: UpdateStatusRequest, req
     if status_value not in REVIEW_STATUSES:
         raise HTTPException(status_code=400, detail="reviewStatus must be one of: pending, approved, rejected.")
     note = (payload.reviewNote or "").strip()
-    with db_conn() as conn:
-        row = conn.execute("SELECT id FROM itineraries WHERE id = ?", (itinerary_id,)).fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Itinerary not found.")
-        conn.execute(
+
+    def update_status(conn: sqlite3.Connection) -> None:
+        cursor = conn.execute(
             "UPDATE itineraries SET review_status = ?, reviewed_at = ?, review_note = ? WHERE id = ?",
             (status_value, now_iso(), note if note else None, itinerary_id),
         )
-        conn.commit()
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Itinerary not found.")
+
+    write_queue.submit(update_status)
     return {"message": "Itinerary review status updated.", **get_itinerary(itinerary_id)}
 
 
@@ -594,7 +802,8 @@ def create_review(payload: ReviewCreateRequest) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="itineraryKey is required.")
     if not text:
         raise HTTPException(status_code=400, detail="reviewText is required.")
-    with db_conn() as conn:
+
+    def insert_review(conn: sqlite3.Connection) -> Optional[int]:
         cursor = conn.execute(
             """
             INSERT INTO itinerary_reviews(itinerary_key, author_name, review_text, rating, created_at)
@@ -602,8 +811,9 @@ def create_review(payload: ReviewCreateRequest) -> Dict[str, Any]:
             """,
             (key, author[:40], text[:MAX_REVIEW_TEXT], float(payload.rating), now_iso()),
         )
-        conn.commit()
-        row_id = cursor.lastrowid
+        return cursor.lastrowid
+
+    row_id = write_queue.submit(insert_review)
     return {
         "message": "Review submitted successfully.",
         "review": {
@@ -617,6 +827,14 @@ def create_review(payload: ReviewCreateRequest) -> Dict[str, Any]:
     }
 
 
+@app.get("/api/admin/write-stats")
+def write_stats(request: Request) -> Dict[str, Any]:
+    user = get_current_user(request)
+    if not user or user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required.")
+    return {"writeQueue": write_queue.stats()}
+
+
 @app.post("/api/chat")
 def chat() -> Dict[str, str]:
     return {
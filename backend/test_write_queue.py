@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / "writes.db"
+    monkeypatch.setattr(main, "DB_PATH", path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, value TEXT NOT NULL)")
+    return path
+
+
+def insert_value(value):
+    def op(conn):
+        return conn.execute("INSERT INTO items(value) VALUES (?)", (value,)).lastrowid
+
+    return op
+
+
+def stored_values(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0]: row[1] for row in conn.execute("SELECT id, value FROM items")}
+
+
+def run_concurrently(writer, ops):
+    results = {}
+    errors = {}
+
+    def worker(name, op):
+        try:
+            results[name] = writer.submit(op)
+        except Exception as exc:
+            errors[name] = exc
+
+    threads = [threading.Thread(target=worker, args=item) for item in ops.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_submits_share_one_batch(db_path):
+    writer = main.WriteQueue(window_ms=300)
+    results, errors = run_concurrently(writer, {f"v{i}": insert_value(f"v{i}") for i in range(10)})
+    writer.stop()
+
+    assert errors == {}
+    stats = writer.stats()
+    assert stats["batches"] == 1
+    assert stats["operations"] == 10
+    assert stats["maxBatchSize"] == 10
+    rows = stored_values(db_path)
+    assert {name: rows[row_id] for name, row_id in results.items()} == {name: name for name in results}
+
+
+def test_failing_op_is_rolled_back_alone(db_path):
+    def failing(conn):
+        conn.execute("INSERT INTO items(value) VALUES ('bad')")
+        raise HTTPException(status_code=404, detail="missing")
+
+    writer = main.WriteQueue(window_ms=300)
+    results, errors = run_concurrently(writer, {"a": insert_value("a"), "bad": failing, "b": insert_value("b")})
+    writer.stop()
+
+    assert set(results) == {"a", "b"}
+    assert isinstance(errors["bad"], HTTPException)
+    assert errors["bad"].status_code == 404
+    assert sorted(stored_values(db_path).values()) == ["a", "b"]
+    assert writer.stats()["failedOperations"] == 1
+
+
+def test_timeout_cancels_queued_op(db_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(conn):
+        started.set()
+        release.wait(5)
+        return conn.execute("INSERT INTO items(value) VALUES ('slow')").lastrowid
+
+    writer = main.WriteQueue(window_ms=0, timeout_seconds=0.1)
+    slow_errors = []
+
+    def submit_slow():
+        try:
+            writer.submit(slow)
+        except HTTPException as exc:
+            slow_errors.append(exc)
+
+    slow_thread = threading.Thread(target=submit_slow)
+    slow_thread.start()
+    assert started.wait(5)
+
+    with pytest.raises(HTTPException) as queued:
+        writer.submit(insert_value("queued"))
+    assert queued.value.status_code == 503
+    assert "not applied" in queued.value.detail
+
+    release.set()
+    slow_thread.join()
+    writer.stop()
+
+    assert slow_errors[0].status_code == 503
+    assert "may still be applied" in slow_errors[0].detail
+    assert list(stored_values(db_path).values()) == ["slow"]
+
+
+def test_writer_failure_fails_callers_immediately(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DB_PATH", tmp_path / "missing" / "writes.db")
+    writer = main.WriteQueue(timeout_seconds=5)
+
+    started = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit(insert_value("x"))
+    assert time.monotonic() - started < 1
+    writer.stop()